@@ -1,69 +1,147 @@
 import os
+from dataclasses import dataclass, asdict, fields
 from dotenv import load_dotenv
 from typing import Optional
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Instance built by Config.load(), shared by every consumer
+_config = None
+
+@dataclass(frozen=True, slots=True)
 class Config:
     """Configuration settings for the RAG Agent application."""
-    
+
     # OpenAI Settings
-    OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
-    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL")
-    OPENAI_TEMPERATURE: float = float(os.getenv("OPENAI_TEMPERATURE"))
-    
+    OPENAI_API_KEY: Optional[str] = None
+    OPENAI_MODEL: str = "gpt-3.5-turbo"
+    OPENAI_TEMPERATURE: float = 0.0
+
     # Document Processing Settings
-    CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE"))
-    CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP"))    
-    DOCUMENTS_FOLDER_PATH: str = os.getenv("DOCUMENTS_FOLDER_PATH")
-    
+    CHUNK_SIZE: int = 1000
+    CHUNK_OVERLAP: int = 200
+    CHUNK_UNIT: str = "characters"
+    CHUNK_SIZE_TOKENS: int = 512
+    CHUNK_OVERLAP_TOKENS: int = 64
+    DOCUMENTS_FOLDER_PATH: str = "./documents"
+
     # Vector Store Settings
-    CHROMA_PERSIST_DIRECTORY: str = os.getenv("CHROMA_PERSIST_DIRECTORY")
-    CHROMA_COLLECTION_NAME: str = os.getenv("CHROMA_COLLECTION_NAME")
-    CHROMA_EMBEDDING_MODEL: str = os.getenv("CHROMA_EMBEDDING_MODEL")
-    
+    CHROMA_PERSIST_DIRECTORY: str = "./chroma_db"
+    CHROMA_COLLECTION_NAME: str = "documents"
+    CHROMA_EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    CHROMA_DISTANCE_METRIC: str = "ip"
+    EMBEDDING_MAX_CONCURRENCY: int = 5
+
     # Application Settings
-    DEFAULT_RETRIEVAL_K: int = int(os.getenv("DEFAULT_RETRIEVAL_K"))
-    LOG_LEVEL: str = os.getenv("LOG_LEVEL")
-    
+    DEFAULT_RETRIEVAL_K: int = 4
+    MAX_CONTEXT_TOKENS: int = 6000
+    MAX_RETRIEVAL_DISTANCE: float = float("inf")
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    LOG_LEVEL: str = "INFO"
+
     # File Processing Settings
-    SUPPORTED_EXTENSIONS = [".pdf", ".docx", ".xlsx", ".xls"]
-    MAX_FILE_SIZE_MB: int = int(os.getenv("MAX_FILE_SIZE_MB"))
-    
+    SUPPORTED_EXTENSIONS: tuple = (".pdf", ".docx", ".xlsx", ".xls")
+    MAX_FILE_SIZE_MB: int = 50
+    PROCESSING_WORKERS: int = os.cpu_count() or 1
+
     @classmethod
-    def validate_config(cls) -> bool:
+    def from_env(cls) -> "Config":
+        """
+        Build a configuration from environment variables.
+
+        Unset variables fall back to the defaults above. Every malformed
+        numeric value is reported in a single error.
+
+        Returns:
+            Config: Parsed configuration
+
+        Raises:
+            ValueError: If any numeric setting cannot be parsed
+        """
+        values = {}
+        errors = []
+        for field in fields(cls):
+            if field.name == "SUPPORTED_EXTENSIONS":
+                continue
+            raw = os.getenv(field.name)
+            if raw is None:
+                continue
+            if field.type in (int, float):
+                try:
+                    values[field.name] = field.type(raw)
+                except ValueError:
+                    errors.append(f"{field.name}={raw!r} is not a valid {field.type.__name__}")
+            else:
+                values[field.name] = raw
+
+        if errors:
+            raise ValueError("Invalid configuration: " + "; ".join(errors))
+        return cls(**values)
+
+    @classmethod
+    def load(cls) -> "Config":
+        """
+        Get the application configuration, parsing the environment on first use.
+
+        Returns:
+            Config: Cached configuration instance
+        """
+        global _config
+        if _config is None:
+            _config = cls.from_env()
+        return _config
+
+    def validate_config(self) -> bool:
         """
         Validate that all required configuration values are set.
-        
+
         Returns:
             bool: True if configuration is valid, False otherwise
         """
-        if not cls.OPENAI_API_KEY:
-            print("Warning: OPENAI_API_KEY not set")
+        missing = [name for name in ("OPENAI_API_KEY", "OPENAI_MODEL", "CHROMA_EMBEDDING_MODEL")
+                   if not getattr(self, name)]
+        if missing:
+            print(f"Warning: required configuration not set: {', '.join(missing)}")
             return False
-        
+
         return True
-    
-    @classmethod
-    def get_config_dict(cls) -> dict:
+
+    def get_chunking_settings(self) -> dict:
         """
-        Get configuration as a dictionary.
-        
+        Get chunk sizing arguments for DocumentProcessor.
+
         Returns:
-            dict: Configuration values
+            dict: chunk_size, chunk_overlap and token_model for the configured CHUNK_UNIT
         """
+        if self.CHUNK_UNIT == "tokens":
+            return {
+                "chunk_size": self.CHUNK_SIZE_TOKENS,
+                "chunk_overlap": self.CHUNK_OVERLAP_TOKENS,
+                "token_model": self.CHROMA_EMBEDDING_MODEL
+            }
         return {
-            "openai_model": cls.OPENAI_MODEL,
-            "openai_temperature": cls.OPENAI_TEMPERATURE,
-            "chunk_size": cls.CHUNK_SIZE,
-            "chunk_overlap": cls.CHUNK_OVERLAP,
-            "persist_directory": cls.CHROMA_PERSIST_DIRECTORY,
-            "collection_name": cls.CHROMA_COLLECTION_NAME,
-            "retrieval_k": cls.DEFAULT_RETRIEVAL_K,
-            "supported_extensions": cls.SUPPORTED_EXTENSIONS,
-            "max_file_size_mb": cls.MAX_FILE_SIZE_MB,
-            "documents_folder_path": cls.DOCUMENTS_FOLDER_PATH,
-            "embedding_model": cls.CHROMA_EMBEDDING_MODEL,
-            "log_level": cls.LOG_LEVEL            
-        } 
\ No newline at end of file
+            "chunk_size": self.CHUNK_SIZE,
+            "chunk_overlap": self.CHUNK_OVERLAP,
+            "token_model": None
+        }
+
+    def get_collection_metadata(self) -> dict:
+        """
+        Get the metadata a new Chroma collection is created with.
+
+        Returns:
+            dict: HNSW index settings (only applied when the collection is first created)
+        """
+        return {"hnsw:space": self.CHROMA_DISTANCE_METRIC}
+
+    def get_config_dict(self) -> dict:
+        """
+        Get configuration as a dictionary.
+
+        Returns:
+            dict: Configuration values (the API key is omitted)
+        """
+        config_dict = asdict(self)
+        del config_dict["OPENAI_API_KEY"]
+        return config_dict
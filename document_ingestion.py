@@ -1,19 +1,80 @@
+import asyncio
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import time
 import chromadb
-from openai import OpenAI
+import numpy as np
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, InternalServerError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 from pathlib import Path
 import logging
 from document_processor import DocumentProcessor
+from openai_clients import create_async_openai_client
 
-# Simple logging setup
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# OpenAI Batch API limit on requests per input file
+BATCH_API_MAX_REQUESTS = 50000
+BATCH_API_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# OpenAI limits on a single embeddings request
+EMBEDDING_MAX_INPUTS = 2048
+EMBEDDING_MAX_TOKENS_PER_REQUEST = 300000
+
+def _estimate_tokens(text: str) -> int:
+    """Roughly estimate a text's token count (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+def chunk_hash(text: str) -> str:
+    """Content hash stored with each chunk so identical text is embedded only once."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# Chunks shorter than this (or with under half as many letters/digits) carry no
+# retrievable signal, e.g. page headers like "- 1 -", and are never embedded
+MIN_CHUNK_CHARS = 32
+
+def _is_low_signal(chunk: str) -> bool:
+    """Check whether a chunk is too short or too sparse to be worth embedding."""
+    chunk = chunk.strip()
+    if len(chunk) < MIN_CHUNK_CHARS:
+        return True
+    return sum(ch.isalnum() for ch in chunk) < MIN_CHUNK_CHARS // 2
+
+# Longest Retry-After delay honoured before falling back to our own backoff
+MAX_RETRY_AFTER_SECONDS = 60
+
+_exponential_wait = wait_exponential(multiplier=1, min=1, max=8)
+
+def _wait_retry_after(retry_state) -> float:
+    """Wait as long as the server's Retry-After header asks, else back off exponentially."""
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            retry_after = None
+        if retry_after is not None and 0 <= retry_after <= MAX_RETRY_AFTER_SECONDS:
+            return retry_after
+    return _exponential_wait(retry_state)
+
+# Back off 1s, 2s, 4s, 8s (or per Retry-After) on transient OpenAI failures before giving up on a batch
+embedding_retry = retry(
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, InternalServerError)),
+    wait=_wait_retry_after,
+    stop=stop_after_attempt(5),
+    reraise=True
+)
+
 class DocumentIngestion:
     """Handles document processing and ingestion into the vector store."""
     
     def __init__(self, openai_client, chroma_collection, embedding_model, 
                  chunk_size=1000, chunk_overlap=200, max_file_size_mb=50, 
-                 supported_extensions=None):
+                 supported_extensions=None, embedding_batch_size=EMBEDDING_MAX_INPUTS,
+                 add_batch_size=5000, embedding_cache=None, max_concurrent_requests=5,
+                 manifest=None, token_model=None, processing_workers=1):
         """
         Initialize the document ingestion system.
         
@@ -25,10 +86,22 @@ class DocumentIngestion:
             chunk_overlap: Overlap between chunks
             max_file_size_mb: Maximum file size in MB
             supported_extensions: List of supported file extensions
+            embedding_batch_size: Maximum number of chunks sent per embedding request
+            add_batch_size: Number of chunks written per vector store add call
+            embedding_cache: Optional EmbeddingCache used to skip re-embedding known text
+            max_concurrent_requests: Maximum embedding requests in flight at once (1 disables concurrency)
+            manifest: Optional IngestionManifest used to skip files that have not changed
+            token_model: Model whose tokenizer sizes chunks; None chunks by characters
+            processing_workers: Number of processes extracting and chunking files during folder ingestion
         """
         self.client = openai_client
         self.collection = chroma_collection
         self.embedding_model = embedding_model
+        self.embedding_batch_size = embedding_batch_size
+        self.add_batch_size = add_batch_size
+        self.embedding_cache = embedding_cache
+        self.max_concurrent_requests = max_concurrent_requests
+        self.manifest = manifest
         
         # Set default supported extensions if not provided
         if supported_extensions is None:
@@ -39,78 +112,348 @@ class DocumentIngestion:
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             max_file_size_mb=max_file_size_mb,
-            supported_extensions=supported_extensions
+            supported_extensions=supported_extensions,
+            workers=processing_workers,
+            token_model=token_model
         )
+        
+        # Settings that shape a file's stored chunks; manifest entries recorded
+        # under different settings count as changed so the file is re-ingested
+        self.settings_fingerprint = hashlib.sha256(json.dumps({
+            "embedding_model": embedding_model,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "token_model": token_model,
+            "min_chunk_chars": MIN_CHUNK_CHARS
+        }, sort_keys=True).encode("utf-8")).hexdigest()
+    
+    def _lookup_cached(self, texts: list) -> tuple:
+        """Split texts into cached embeddings and the indices that still need embedding."""
+        embeddings = [None] * len(texts)
+        keys = None
+        if self.embedding_cache is not None:
+            keys = [self.embedding_cache.make_key(self.embedding_model, text) for text in texts]
+            cached = self.embedding_cache.get_many(keys)
+            embeddings = [cached.get(key) for key in keys]
+        
+        missing = [j for j, embedding in enumerate(embeddings) if embedding is None]
+        return embeddings, keys, missing
+    
+    def _fill_missing(self, response, embeddings: list, keys: list, missing: list) -> np.ndarray:
+        """Merge freshly fetched embeddings into the batch and write them to the cache."""
+        for item in response.data:
+            embeddings[missing[item.index]] = np.asarray(item.embedding, dtype=np.float32)
+        
+        if self.embedding_cache is not None:
+            self.embedding_cache.put_many({keys[j]: embeddings[j] for j in missing})
+        
+        return np.vstack(embeddings)
     
-    def get_embedding(self, text: str) -> list:
-        """Get embedding for text using OpenAI."""
+    @embedding_retry
+    def _create_embeddings(self, inputs: list):
+        """Call the embeddings endpoint, retrying transient failures."""
+        return self.client.embeddings.create(
+            model=self.embedding_model,
+            input=inputs
+        )
+    
+    @embedding_retry
+    async def _acreate_embeddings(self, async_client, inputs: list):
+        """Async variant of _create_embeddings."""
+        return await async_client.embeddings.create(
+            model=self.embedding_model,
+            input=inputs
+        )
+    
+    def get_embeddings_batch(self, texts: list) -> np.ndarray:
+        """Get a (len(texts), dim) float32 embedding matrix, requesting only cache misses from OpenAI."""
         try:
-            response = self.client.embeddings.create(
-                model=self.embedding_model,
-                input=text
-            )
-            return response.data[0].embedding
+            embeddings, keys, missing = self._lookup_cached(texts)
+            if not missing:
+                return np.vstack(embeddings)
+            
+            response = self._create_embeddings([texts[j] for j in missing])
+            return self._fill_missing(response, embeddings, keys, missing)
         except Exception as e:
-            logger.error(f"Error getting embedding: {e}")
+            logger.error("Error getting batch embeddings: %s", e)
             return None
     
-    def add_document_chunks(self, chunks: list, metadata: dict) -> dict:
-        """Add processed document chunks to the vector store."""
+    async def aget_embeddings_batch(self, async_client, texts: list, semaphore: asyncio.Semaphore) -> np.ndarray:
+        """Async variant of get_embeddings_batch bounded by a shared semaphore."""
         try:
-            chunks_added = 0
+            embeddings, keys, missing = self._lookup_cached(texts)
+            if not missing:
+                return np.vstack(embeddings)
             
-            for i, chunk in enumerate(chunks):
-                if not chunk.strip():
-                    continue
-                
-                # Get embedding
-                embedding = self.get_embedding(chunk)
-                if embedding is None:
-                    continue
-                
-                # Create unique document ID
-                doc_id = f"{Path(metadata['filename']).stem}_{i}"
-                
-                # Add to collection
-                self.collection.add(
-                    embeddings=[embedding],
-                    documents=[chunk],
-                    metadatas=[{
-                        **metadata,
-                        "chunk_id": i
-                    }],
-                    ids=[doc_id]
+            async with semaphore:
+                response = await self._acreate_embeddings(async_client, [texts[j] for j in missing])
+            return self._fill_missing(response, embeddings, keys, missing)
+        except Exception as e:
+            logger.error("Error getting batch embeddings: %s", e)
+            return None
+    
+    def _create_async_client(self) -> AsyncOpenAI:
+        """Create a pooled async client mirroring the settings of the sync OpenAI client."""
+        return create_async_openai_client(self.client)
+    
+    async def _aembed_batches(self, batches: list) -> list:
+        """Embed all batches concurrently, returning results in input order."""
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        async with self._create_async_client() as async_client:
+            return await asyncio.gather(*(
+                self.aget_embeddings_batch(async_client, batch, semaphore) for batch in batches
+            ))
+    
+    def _embed_batches(self, batches: list) -> list:
+        """Embed each batch of texts, firing requests concurrently when enabled."""
+        if self.max_concurrent_requests > 1 and len(batches) > 1:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(self._aembed_batches(batches))
+            # Called from inside an event loop (Jupyter, async callers): asyncio.run would
+            # raise there, so run a separate loop on a worker thread
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                return executor.submit(asyncio.run, self._aembed_batches(batches)).result()
+        return [self.get_embeddings_batch(batch) for batch in batches]
+    
+    def _split_batches(self, pending: list) -> list:
+        """Group (index, text) pairs into embedding requests within the input and token limits."""
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for entry in pending:
+            tokens = _estimate_tokens(entry[1])
+            if batch and (len(batch) >= self.embedding_batch_size
+                          or batch_tokens + tokens > EMBEDDING_MAX_TOKENS_PER_REQUEST):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(entry)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    def _lookup_stored(self, hashes: list) -> dict:
+        """
+        Fetch embeddings already stored in the collection for the given chunk hashes.
+        
+        Only consulted without an embedding cache, which already covers
+        every text embedded before.
+        
+        Args:
+            hashes: Chunk hashes to look up
+            
+        Returns:
+            dict: Embedding for each hash found in the collection
+        """
+        found = {}
+        if self.embedding_cache is not None:
+            return found
+        try:
+            for start in range(0, len(hashes), EMBEDDING_MAX_INPUTS):
+                results = self.collection.get(
+                    where={"chunk_hash": {"$in": hashes[start:start + EMBEDDING_MAX_INPUTS]}},
+                    include=["embeddings", "metadatas"]
                 )
-                chunks_added += 1
-            print(f"Added {chunks_added} chunks from {metadata['filename']}")
-            logger.info(f"Added {chunks_added} chunks from {metadata['filename']}")
+                for metadata, embedding in zip(results["metadatas"], results["embeddings"]):
+                    found[metadata["chunk_hash"]] = np.asarray(embedding, dtype=np.float32)
+        except Exception as e:
+            logger.error("Error looking up stored embeddings: %s", e)
+        return found
+    
+    def _embed_all(self, texts: list) -> list:
+        """
+        Embed texts in as few requests as the limits allow, running requests concurrently.
+        
+        Each distinct text is embedded once and its vector shared by every duplicate.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            list: One embedding per text, in input order (None where its request failed)
+        """
+        text_hashes = [chunk_hash(text) for text in texts]
+        unique = dict(zip(text_hashes, texts))
+        
+        embeddings = self._lookup_stored(list(unique))
+        batches = self._split_batches([(h, text) for h, text in unique.items() if h not in embeddings])
+        batch_embeddings = self._embed_batches([[text for _, text in batch] for batch in batches])
+        
+        for batch, batch_result in zip(batches, batch_embeddings):
+            if batch_result is None:
+                continue
+            for (h, _), embedding in zip(batch, batch_result):
+                embeddings[h] = embedding
+        return [embeddings.get(h) for h in text_hashes]
+    
+    def _flush_to_collection(self, ids: list, embeddings: list, documents: list, metadatas: list) -> None:
+        """Write buffered chunks to the vector store in a single add call, with unit-length embeddings."""
+        if not ids:
+            return
+        matrix = np.vstack(embeddings)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+        self.collection.add(
+            embeddings=matrix,
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids
+        )
+    
+    def _build_rows(self, pending: list, embeddings: list, metadata: dict) -> tuple:
+        """
+        Build the columnar lists Chroma expects for a file's embedded chunks.
+        
+        Args:
+            pending: (chunk_id, chunk) pairs for the file
+            embeddings: Embedding for each pair, or None if it failed to embed
+            metadata: File metadata stored with every chunk
+            
+        Returns:
+            tuple: (ids, embeddings, documents, metadatas) lists
+        """
+        base_metadata = dict(metadata)
+        
+        # Same-named files in different folders get distinct IDs via a path hash
+        path_hash = hashlib.md5(metadata['file_path'].encode("utf-8")).hexdigest()[:8]
+        id_prefix = f"{Path(metadata['filename']).stem}_{path_hash}"
+        
+        rows = ([], [], [], [])
+        for (i, chunk), embedding in zip(pending, embeddings):
+            if embedding is None:
+                continue
+            rows[0].append(f"{id_prefix}_{i}")
+            rows[1].append(embedding)
+            rows[2].append(chunk)
+            rows[3].append(dict(base_metadata, chunk_id=i, chunk_hash=chunk_hash(chunk)))
+        return rows
+    
+    def _write_rows(self, rows: tuple):
+        """Write columnar rows to Chroma in add_batch_size slices, yielding the IDs written by each add call."""
+        ids, embeddings, documents, metadatas = rows
+        for start in range(0, len(ids), self.add_batch_size):
+            end = start + self.add_batch_size
+            self._flush_to_collection(ids[start:end], embeddings[start:end], documents[start:end], metadatas[start:end])
+            yield ids[start:end]
+    
+    @staticmethod
+    def _embedding_error(embeddings: list):
+        """Describe how many of a file's chunks failed to embed, or None if all succeeded."""
+        failed = sum(embedding is None for embedding in embeddings)
+        if failed:
+            return f"{failed} of {len(embeddings)} chunks failed to embed"
+        return None
+    
+    def _add_embedded_chunks(self, pending: list, embeddings: list, metadata: dict) -> dict:
+        """
+        Write a file's embedded chunks to the vector store.
+        
+        Nothing is written unless every chunk was embedded, so a file is
+        never stored (or recorded as ingested) with chunks missing.
+        
+        Args:
+            pending: (chunk_id, chunk) pairs for the file
+            embeddings: Embedding for each pair, or None if it failed to embed
+            metadata: File metadata stored with every chunk
+            
+        Returns:
+            dict: success, chunks_added, chunk_ids and message
+        """
+        error = self._embedding_error(embeddings)
+        if error is not None:
+            logger.error("Not adding %s: %s", metadata['filename'], error)
             return {
-                "success": True,
-                "chunks_added": chunks_added,
-                "message": f"Successfully added {chunks_added} chunks"
+                "success": False,
+                "chunks_added": 0,
+                "chunk_ids": [],
+                "message": f"Error adding chunks: {error}"
             }
-            
+        
+        rows = self._build_rows(pending, embeddings, metadata)
+        chunk_ids = []
+        try:
+            for flushed_ids in self._write_rows(rows):
+                chunk_ids.extend(flushed_ids)
         except Exception as e:
-            logger.error(f"Error adding document chunks: {e}")
+            logger.error("Error adding document chunks: %s", e)
             return {
                 "success": False,
-                "chunks_added": 0,
+                "chunks_added": len(chunk_ids),
+                "chunk_ids": chunk_ids,
                 "message": f"Error adding chunks: {str(e)}"
             }
+        
+        chunks_added = len(chunk_ids)
+        logger.info("Added %d chunks from %s", chunks_added, metadata['filename'])
+        return {
+            "success": True,
+            "chunks_added": chunks_added,
+            "chunk_ids": chunk_ids,
+            "message": f"Successfully added {chunks_added} chunks"
+        }
+    
+    @staticmethod
+    def _pending_file_chunks(chunks: list) -> list:
+        """List a file's (chunk_id, chunk) pairs worth embedding."""
+        # Keep the original chunk index so document IDs stay stable
+        return [(i, chunk) for i, chunk in enumerate(chunks) if not _is_low_signal(chunk)]
+    
+    def add_document_chunks(self, chunks: list, metadata: dict) -> dict:
+        """Add processed document chunks to the vector store."""
+        pending = self._pending_file_chunks(chunks)
+        embeddings = self._embed_all([chunk for _, chunk in pending])
+        return self._add_embedded_chunks(pending, embeddings, metadata)
+    
+    def _needs_ingest(self, file_path: str) -> bool:
+        """Check the manifest to decide whether a file changed since it was last ingested."""
+        if self.manifest is None:
+            return True
+        try:
+            # Same key as the file_path metadata the manifest entry was recorded under
+            return not self.manifest.is_unchanged(str(Path(file_path).resolve()), self.settings_fingerprint)
+        except OSError:
+            return True
+    
+    def _drop_previous_chunks(self, file_path: str) -> None:
+        """Delete chunks from an earlier version of a file before it is re-added."""
+        if self.manifest is not None:
+            self.collection.delete(where={"file_path": file_path})
+    
+    def _replace_file_chunks(self, pending: list, embeddings: list, metadata: dict) -> dict:
+        """Replace a file's stored chunks with freshly embedded ones and record the result in the manifest."""
+        # Keep the previous version of the file if the new one cannot be fully embedded
+        error = self._embedding_error(embeddings)
+        if error is None:
+            self._drop_previous_chunks(metadata["file_path"])
+        
+        add_result = self._add_embedded_chunks(pending, embeddings, metadata)
+        
+        if self.manifest is not None and add_result["success"]:
+            self.manifest.record(metadata["file_path"], add_result["chunk_ids"], self.settings_fingerprint)
+        return add_result
     
     def process_and_add_document(self, file_path: str) -> dict:
         """Process a document and add it to the vector store."""
+        if not self._needs_ingest(file_path):
+            return {
+                "success": True,
+                "message": f"Skipped unchanged file {Path(file_path).name}",
+                "chunks_added": 0,
+                "file_metadata": {}
+            }
+        
         # Use document processor to extract and chunk
         processing_result = self.doc_processor.process_file(file_path)
         
         if not processing_result["success"]:
             return processing_result
         
-        # Add chunks to vector store
-        add_result = self.add_document_chunks(
-            processing_result["chunks"], 
-            processing_result["metadata"]
-        )
+        # Embed before touching the vector store, then swap in the new chunks
+        pending = self._pending_file_chunks(processing_result["chunks"])
+        embeddings = self._embed_all([chunk for _, chunk in pending])
+        add_result = self._replace_file_chunks(pending, embeddings, processing_result["metadata"])
         
         return {
             "success": add_result["success"],
@@ -119,44 +462,279 @@ class DocumentIngestion:
             "file_metadata": processing_result["metadata"]
         }
     
-    def process_and_add_folder(self, folder_path: str) -> dict:
-        """Process all documents in a folder and add them to the vector store."""
-        # Use document processor
-        processing_result = self.doc_processor.process_folder(folder_path)
+    def _add_processed_files(self, processing_result: dict, pending: list, file_embeddings: list) -> dict:
+        """
+        Add every extracted file of a folder to the vector store and summarise the outcome.
         
-        if not processing_result["success"]:
-            return processing_result
+        Rows from consecutive files are buffered and written together, one
+        add call per add_batch_size rows rather than at least one per file.
         
+        Args:
+            processing_result: Result of DocumentProcessor.process_folder
+            pending: (chunk_id, chunk) pairs for each processed file
+            file_embeddings: Embeddings matching pending for each processed file,
+                as a list or an iterator consumed one file at a time
+            
+        Returns:
+            dict: Folder ingestion summary
+        """
         total_chunks_added = 0
         successful_files = []
         failed_files = list(processing_result["failed_files"])  # Copy existing failures
         
-        # Process each successfully extracted file
-        for file_data in processing_result["processed_files"]:
-            add_result = self.add_document_chunks(
-                file_data["chunks"], 
-                file_data["metadata"]
-            )
+        buffer = ([], [], [], [])  # ids, embeddings, documents, metadatas
+        buffered_files = []  # (file_data, start, end) row ranges in the buffer
+        
+        def flush():
+            nonlocal total_chunks_added
+            flushed = 0
+            try:
+                for ids in self._write_rows(buffer):
+                    flushed += len(ids)
+            except Exception as e:
+                logger.error("Error adding buffered chunks, retrying file by file: %s", e)
             
-            if add_result["success"]:
-                total_chunks_added += add_result["chunks_added"]
+            for file_data, start, end in buffered_files:
+                error = None
+                if end > flushed:
+                    # Resume from the last flushed offset so a bad file fails on its own
+                    try:
+                        for _ in self._write_rows(tuple(column[max(start, flushed):end] for column in buffer)):
+                            pass
+                    except Exception as e:
+                        logger.error("Error adding document chunks: %s", e)
+                        error = f"Error adding chunks: {str(e)}"
+                
+                if error is not None:
+                    failed_files.append({
+                        "file_path": file_data["file_path"],
+                        "error": error,
+                        "metadata": file_data["metadata"]
+                    })
+                    continue
+                
+                chunk_ids = buffer[0][start:end]
+                if self.manifest is not None:
+                    self.manifest.record(file_data["metadata"]["file_path"], chunk_ids, self.settings_fingerprint)
+                logger.info("Added %d chunks from %s", len(chunk_ids), file_data["metadata"]["filename"])
+                total_chunks_added += len(chunk_ids)
                 successful_files.append({
                     "file_path": file_data["file_path"],
-                    "chunks_added": add_result["chunks_added"],
+                    "chunks_added": len(chunk_ids),
                     "metadata": file_data["metadata"]
                 })
-            else:
+            
+            for column in buffer:
+                column.clear()
+            buffered_files.clear()
+        
+        # Process each successfully extracted file
+        for file_data, file_pending, embeddings in zip(processing_result["processed_files"], pending, file_embeddings):
+            # A partly embedded file is reported as failed and keeps its previous chunks
+            error = self._embedding_error(embeddings)
+            if error is not None:
+                logger.error("Not adding %s: %s", file_data["metadata"]["filename"], error)
                 failed_files.append({
                     "file_path": file_data["file_path"],
-                    "error": add_result["message"],
+                    "error": f"Error adding chunks: {error}",
                     "metadata": file_data["metadata"]
                 })
+                continue
+            
+            self._drop_previous_chunks(file_data["metadata"]["file_path"])
+            rows = self._build_rows(file_pending, embeddings, file_data["metadata"])
+            start = len(buffer[0])
+            for column, values in zip(buffer, rows):
+                column.extend(values)
+            buffered_files.append((file_data, start, len(buffer[0])))
+            
+            if len(buffer[0]) >= self.add_batch_size:
+                flush()
+        flush()
+        
+        skipped_files = processing_result.get("skipped_files", [])
+        message = f"Processed {len(successful_files)} files, added {total_chunks_added} chunks"
+        if skipped_files:
+            message += f", skipped {len(skipped_files)} unchanged files"
         
         return {
             "success": True,
-            "message": f"Processed {len(successful_files)} files, added {total_chunks_added} chunks",
+            "message": message,
             "files_processed": len(successful_files),
             "total_chunks_added": total_chunks_added,
             "successful_files": successful_files,
-            "failed_files": failed_files
-        } 
\ No newline at end of file
+            "failed_files": failed_files,
+            "skipped_files": skipped_files
+        }
+    
+    @classmethod
+    def _pending_chunks(cls, processing_result: dict) -> list:
+        """List the (chunk_id, chunk) pairs worth embedding for each processed file."""
+        return [
+            cls._pending_file_chunks(file_data["chunks"])
+            for file_data in processing_result["processed_files"]
+        ]
+    
+    def process_and_add_folder(self, folder_path: str) -> dict:
+        """Process all documents in a folder and add them to the vector store."""
+        # Use document processor
+        processing_result = self.doc_processor.process_folder(folder_path, file_filter=self._needs_ingest)
+        
+        if not processing_result["success"]:
+            return processing_result
+        
+        return self._embed_and_add_files(processing_result, self._pending_chunks(processing_result))
+    
+    def _iter_file_embeddings(self, pending: list):
+        """
+        Yield each file's embeddings, embedding about add_batch_size chunks at a time.
+        
+        Files are grouped into windows so requests for different files still run
+        concurrently, while only one window of embeddings is held before it is written.
+        
+        Args:
+            pending: (chunk_id, chunk) pairs for each processed file
+            
+        Yields:
+            list: Embeddings matching pending for the next file
+        """
+        window = []
+        window_size = 0
+        for index, file_pending in enumerate(pending):
+            window.append(file_pending)
+            window_size += len(file_pending)
+            if window_size < self.add_batch_size and index < len(pending) - 1:
+                continue
+            
+            embeddings = iter(self._embed_all([chunk for window_pending in window for _, chunk in window_pending]))
+            for window_pending in window:
+                yield list(islice(embeddings, len(window_pending)))
+            window = []
+            window_size = 0
+    
+    def _embed_and_add_files(self, processing_result: dict, pending: list) -> dict:
+        """Embed and add a processed folder's chunks one window at a time."""
+        return self._add_processed_files(processing_result, pending, self._iter_file_embeddings(pending))
+    
+    def _run_embedding_batch_jobs(self, requests: list, poll_interval: int) -> dict:
+        """
+        Embed texts through the OpenAI Batch API.
+        
+        Args:
+            requests: List of (custom_id, text) pairs
+            poll_interval: Seconds to wait between job status checks
+            
+        Returns:
+            tuple: (mapping of custom_id to float32 embedding for every request that
+                succeeded, list of job summaries with batch_id, status, requests and error)
+        """
+        embeddings = {}
+        jobs = []
+        
+        for start in range(0, len(requests), BATCH_API_MAX_REQUESTS):
+            job_requests = requests[start:start + BATCH_API_MAX_REQUESTS]
+            job = {"batch_id": None, "status": "not_submitted", "requests": len(job_requests), "error": None}
+            jobs.append(job)
+            
+            # A failed job only loses its own requests; their files are reported as failed
+            try:
+                self._run_embedding_batch_job(job_requests, poll_interval, job, embeddings)
+            except Exception as e:
+                logger.error("Embedding batch %s failed: %s", job["batch_id"], e)
+                job["error"] = str(e)
+        
+        return embeddings, jobs
+    
+    def _run_embedding_batch_job(self, job_requests: list, poll_interval: int, job: dict, embeddings: dict) -> None:
+        """Submit one Batch API job, wait for it and collect its embeddings, updating job as it goes."""
+        # One embeddings request per chunk, uploaded as a JSONL input file
+        payload = "".join(
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/embeddings",
+                "body": {"model": self.embedding_model, "input": text}
+            }) + "\n"
+            for custom_id, text in job_requests
+        )
+        input_file = embedding_retry(self.client.files.create)(
+            file=("embedding_requests.jsonl", payload.encode("utf-8")),
+            purpose="batch"
+        )
+        batch = embedding_retry(self.client.batches.create)(
+            input_file_id=input_file.id,
+            endpoint="/v1/embeddings",
+            completion_window="24h"
+        )
+        job["batch_id"] = batch.id
+        job["status"] = batch.status
+        logger.info("Submitted embedding batch %s with %d requests", batch.id, len(job_requests))
+        
+        while batch.status not in BATCH_API_FINAL_STATUSES:
+            time.sleep(poll_interval)
+            batch = embedding_retry(self.client.batches.retrieve)(batch.id)
+            job["status"] = batch.status
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"batch ended with status {batch.status}")
+        
+        output = embedding_retry(self.client.files.content)(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.error("Embedding request %s failed: %s", record.get('custom_id'), record.get('error'))
+                continue
+            embeddings[record["custom_id"]] = np.asarray(
+                response["body"]["data"][0]["embedding"], dtype=np.float32
+            )
+    
+    def process_and_add_folder_batch(self, folder_path: str, threshold: int = 10000, poll_interval: int = 30) -> dict:
+        """
+        Process a folder and embed its chunks through the OpenAI Batch API.
+        
+        The Batch API is asynchronous and billed at half the price of the
+        embeddings endpoint, which suits large one-shot ingests. Folders with
+        fewer than `threshold` chunks use the regular synchronous path.
+        
+        Args:
+            folder_path: Path to the folder containing documents
+            threshold: Minimum number of chunks before the Batch API is used
+            poll_interval: Seconds to wait between job status checks
+            
+        Returns:
+            dict: Same shape as process_and_add_folder, plus batch_jobs (batch_id,
+                status, requests and error of each job) when the Batch API was used
+        """
+        processing_result = self.doc_processor.process_folder(folder_path, file_filter=self._needs_ingest)
+        
+        if not processing_result["success"]:
+            return processing_result
+        
+        pending = self._pending_chunks(processing_result)
+        
+        if sum(len(file_pending) for file_pending in pending) < threshold:
+            return self._embed_and_add_files(processing_result, pending)
+        
+        # Submit each distinct chunk once, keyed by its hash, serving known chunks directly
+        unique = {chunk_hash(chunk): chunk for file_pending in pending for _, chunk in file_pending}
+        embeddings = self._lookup_stored(list(unique))
+        hashes = [h for h in unique if h not in embeddings]
+        cached, keys, missing = self._lookup_cached([unique[h] for h in hashes])
+        embeddings.update((hashes[j], embedding) for j, embedding in enumerate(cached) if embedding is not None)
+        
+        requests = [(hashes[j], unique[hashes[j]]) for j in missing]
+        fetched, batch_jobs = self._run_embedding_batch_jobs(requests, poll_interval) if requests else ({}, [])
+        embeddings.update(fetched)
+        if self.embedding_cache is not None:
+            self.embedding_cache.put_many({keys[j]: fetched[hashes[j]] for j in missing if hashes[j] in fetched})
+        
+        file_embeddings = [
+            [embeddings.get(chunk_hash(chunk)) for _, chunk in file_pending] for file_pending in pending
+        ]
+        result = self._add_processed_files(processing_result, pending, file_embeddings)
+        # Job IDs let unfinished or failed jobs be inspected (and billed output collected) later
+        result["batch_jobs"] = batch_jobs
+        return result
@@ -1,18 +1,40 @@
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
+import tiktoken
 import pandas as pd
 from docx import Document as DocxDocument
+from openpyxl import load_workbook
 from pathlib import Path
 import logging
 
-# Simple logging setup
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Plain text without ligature preservation or dehyphenation. Gap-based space insertion
+# stays on: many PDFs (e.g. pdfTeX output) have no space glyphs between words
+PDF_TEXT_FLAGS = fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+
+# Files handed to a worker process per task in process_folder
+WORKER_CHUNKSIZE = 4
+
+# Per-process processor used by the worker pool in process_folder
+_worker_processor = None
+
+def _init_worker(processor_kwargs: dict):
+    """Create the DocumentProcessor owned by a worker process."""
+    global _worker_processor
+    _worker_processor = DocumentProcessor(**processor_kwargs)
+
+def _worker_process_file(file_path: str) -> dict:
+    """Process a single file inside a worker process."""
+    return _worker_processor.process_file(file_path)
+
 class DocumentProcessor:
     """Handles document text extraction and chunking."""
     
-    def __init__(self, chunk_size=1000, chunk_overlap=200, max_file_size_mb=50, supported_extensions=None):
+    def __init__(self, chunk_size=1000, chunk_overlap=200, max_file_size_mb=50, supported_extensions=None, workers=1,
+                 token_model=None):
         """
         Initialize the document processor with configuration settings.
         
@@ -21,67 +43,88 @@ class DocumentProcessor:
             chunk_overlap: Overlap between chunks (default: 200)
             max_file_size_mb: Maximum file size in MB (default: 50)
             supported_extensions: List of supported file extensions (default: [".pdf", ".docx", ".xlsx", ".xls"])
+            workers: Number of processes used by process_folder (default: 1, sequential)
+            token_model: OpenAI model whose tokenizer is used for chunking; when set,
+                chunk_size and chunk_overlap are measured in tokens (default: None, characters)
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.max_file_size_mb = max_file_size_mb
         self.supported_extensions = supported_extensions or [".pdf", ".docx", ".xlsx", ".xls"]
+        self.workers = workers
+        self._ext_set = frozenset(ext.lower() for ext in self.supported_extensions)
+        self.token_model = token_model
+        self._encoder = None
     
-    def extract_text_from_file(self, file_path: str) -> dict:
+    def _check_file(self, file_path: Path) -> tuple:
         """
-        Extract text from different file types.
+        Validate that a file can be processed.
         
         Args:
-            file_path: Path to the file to extract text from
+            file_path: Path to the file to check
             
         Returns:
-            dict: Contains success status, text content, and metadata
+            tuple: (error, metadata) where error is None if the file can be processed
         """
-        file_path = Path(file_path)
-        
         # Check if file exists
         if not file_path.exists():
-            return {
-                "success": False,
-                "text": "",
-                "error": f"File not found: {file_path}",
-                "metadata": {}
-            }
+            return f"File not found: {file_path}", {}
         
         # Check file size
         file_size_mb = file_path.stat().st_size / (1024 * 1024)
         if file_size_mb > self.max_file_size_mb:
-            return {
-                "success": False,
-                "text": "",
-                "error": f"File too large: {file_size_mb:.1f}MB (max: {self.max_file_size_mb}MB)",
-                "metadata": {"file_size_mb": file_size_mb}
-            }
+            return (
+                f"File too large: {file_size_mb:.1f}MB (max: {self.max_file_size_mb}MB)",
+                {"file_size_mb": file_size_mb}
+            )
         
         # Check supported extensions
-        if file_path.suffix.lower() not in self.supported_extensions:
-            return {
-                "success": False,
-                "text": "",
-                "error": f"Unsupported file type: {file_path.suffix}",
-                "metadata": {"file_extension": file_path.suffix}
-            }
+        if file_path.suffix.lower() not in self._ext_set:
+            return f"Unsupported file type: {file_path.suffix}", {"file_extension": file_path.suffix}
         
-        text = ""
-        metadata = {
+        return None, {
             "filename": file_path.name,
-            "file_path": str(file_path),
+            # Resolved so the same file reached through different paths gets the same
+            # chunk IDs, manifest entry and delete filter
+            "file_path": str(file_path.resolve()),
             "file_size_mb": file_size_mb,
             "file_extension": file_path.suffix.lower()
         }
+    
+    def _iter_text(self, file_path: Path):
+        """Yield the text of a file in pieces (one per page for PDFs)."""
+        if file_path.suffix.lower() == '.pdf':
+            yield from self._iter_pdf_text(file_path)
+        elif file_path.suffix.lower() == '.docx':
+            yield self._extract_from_docx(file_path)
+        elif file_path.suffix.lower() == '.xlsx':
+            yield from self._iter_xlsx_text(file_path)
+        elif file_path.suffix.lower() == '.xls':
+            yield self._extract_from_excel(file_path)
+    
+    def extract_text_from_file(self, file_path: str) -> dict:
+        """
+        Extract text from different file types.
+        
+        Args:
+            file_path: Path to the file to extract text from
+            
+        Returns:
+            dict: Contains success status, text content, and metadata
+        """
+        file_path = Path(file_path)
+        
+        error, metadata = self._check_file(file_path)
+        if error:
+            return {
+                "success": False,
+                "text": "",
+                "error": error,
+                "metadata": metadata
+            }
         
         try:
-            if file_path.suffix.lower() == '.pdf':
-                text = self._extract_from_pdf(file_path)
-            elif file_path.suffix.lower() == '.docx':
-                text = self._extract_from_docx(file_path)
-            elif file_path.suffix.lower() in ['.xlsx', '.xls']:
-                text = self._extract_from_excel(file_path)
+            text = "".join(self._iter_text(file_path))
             
             if not text.strip():
                 return {
@@ -101,7 +144,7 @@ class DocumentProcessor:
             }
             
         except Exception as e:
-            logger.error(f"Error extracting text from {file_path}: {e}")
+            logger.error("Error extracting text from %s: %s", file_path, e)
             return {
                 "success": False,
                 "text": "",
@@ -109,31 +152,123 @@ class DocumentProcessor:
                 "metadata": metadata
             }
     
-    def _extract_from_pdf(self, file_path: Path) -> str:
-        """Extract text from PDF file."""
-        text = ""
-        doc = fitz.open(file_path)
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        return text
+    def _iter_pdf_text(self, file_path: Path):
+        """Yield the text of a PDF file one page at a time."""
+        with fitz.open(str(file_path), filetype="pdf") as doc:
+            for page in doc:
+                yield page.get_text("text", flags=PDF_TEXT_FLAGS, sort=False)
     
     def _extract_from_docx(self, file_path: Path) -> str:
         """Extract text from DOCX file."""
-        text = ""
         doc = DocxDocument(file_path)
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return "\n".join(paragraph.text for paragraph in doc.paragraphs)
+    
+    def _iter_xlsx_text(self, file_path: Path):
+        """Yield the text of an XLSX workbook one sheet at a time, streaming rows in read-only mode."""
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                lines = [f"\n--- {sheet.title} ---"]
+                for row in sheet.iter_rows(values_only=True):
+                    lines.append("\t".join("" if value is None else str(value) for value in row))
+                yield "\n".join(lines) + "\n"
+        finally:
+            workbook.close()
     
     def _extract_from_excel(self, file_path: Path) -> str:
-        """Extract text from Excel file."""
-        text = ""
+        """Extract text from legacy Excel (.xls) file."""
+        parts = []
         df = pd.read_excel(file_path, sheet_name=None)
         for sheet_name, sheet_df in df.items():
-            text += f"\n--- {sheet_name} ---\n"
-            text += sheet_df.to_string(index=False) + "\n"
-        return text
+            parts.append(f"\n--- {sheet_name} ---\n")
+            parts.append(sheet_df.to_string(index=False) + "\n")
+        return "".join(parts)
+    
+    def _find_chunk_end(self, text: str, start: int, chunk_size: int, min_offset: int) -> int:
+        """
+        Find where a chunk starting at `start` should end.
+        
+        Prefers the last sentence end, then the last word boundary, found at
+        or after `start + min_offset`. Searches `text` in place without
+        copying the chunk out.
+        """
+        end = start + chunk_size
+        
+        # Try to break at sentence or word boundary
+        last_period = text.rfind('.', start + min_offset, end)
+        if last_period != -1:
+            return last_period + 1
+        last_space = text.rfind(' ', start + min_offset, end)
+        if last_space != -1:
+            return last_space
+        return end
+    
+    def _get_encoder(self):
+        """Load the tokenizer for token_model on first use."""
+        if self._encoder is None:
+            self._encoder = tiktoken.encoding_for_model(self.token_model)
+        return self._encoder
+    
+    def _find_token_chunk_end(self, ids: list, start: int, chunk_size: int, min_offset: int) -> int:
+        """Token-level counterpart of _find_chunk_end: break after a sentence end or before a word."""
+        encoder = self._get_encoder()
+        end = start + chunk_size
+        candidates = range(end - 1, start + min_offset - 1, -1)
+        
+        for j in candidates:
+            if b"." in encoder.decode_single_token_bytes(ids[j]):
+                return j + 1
+        for j in candidates:
+            if encoder.decode_single_token_bytes(ids[j])[:1].isspace():
+                return j
+        # No boundary token (e.g. CJK text): at least keep multi-byte characters whole
+        return self._align_to_character(ids, end, start + min_offset)
+    
+    def _align_to_character(self, ids: list, index: int, lowest: int) -> int:
+        """Move a token index back (not below lowest) until it no longer splits a UTF-8 character."""
+        encoder = self._get_encoder()
+        # Byte-level tokens can start with a UTF-8 continuation byte (0b10xxxxxx)
+        while (lowest < index < len(ids)
+               and encoder.decode_single_token_bytes(ids[index])[0] & 0xC0 == 0x80):
+            index -= 1
+        return index
+    
+    def _chunk_tokens_stream(self, text_iter, chunk_size: int, overlap: int):
+        """Token-based variant of chunk_text_stream; sizes are counted in tokens."""
+        encoder = self._get_encoder()
+        min_offset = int(chunk_size * 0.8) + 1
+        
+        ids = []
+        start = 0
+        started = False
+        
+        for piece in text_iter:
+            # Special-token strings in documents are treated as plain text
+            ids = ids[start:] + encoder.encode(piece, disallowed_special=())
+            start = 0
+            
+            while len(ids) - start > chunk_size:
+                end = self._find_token_chunk_end(ids, start, chunk_size, min_offset)
+                chunk_text = encoder.decode(ids[start:end]).strip()
+                if chunk_text:
+                    yield chunk_text
+                start = self._align_to_character(ids, end - overlap, start + 1)
+                started = True
+        
+        if not started:
+            yield encoder.decode(ids)
+            return
+        
+        while start < len(ids):
+            end = start + chunk_size
+            if end < len(ids):
+                end = self._find_token_chunk_end(ids, start, chunk_size, min_offset)
+            
+            chunk_text = encoder.decode(ids[start:end]).strip()
+            if chunk_text:
+                yield chunk_text
+            
+            start = self._align_to_character(ids, end - overlap, start + 1)
     
     def chunk_text(self, text: str, chunk_size: int = None, overlap: int = None) -> list:
         """
@@ -147,90 +282,157 @@ class DocumentProcessor:
         Returns:
             list: List of text chunks
         """
+        return list(self.chunk_text_stream([text], chunk_size, overlap))
+    
+    def chunk_text_stream(self, text_iter, chunk_size: int = None, overlap: int = None):
+        """
+        Split a stream of text pieces into overlapping chunks.
+        
+        Produces the same chunks as chunk_text on the concatenated text, but
+        only keeps the unconsumed tail of the stream in memory. Sizes are in
+        tokens when token_model is set, otherwise in characters.
+        
+        Args:
+            text_iter: Iterable of text pieces (e.g. PDF pages)
+            chunk_size: Size of each chunk (uses config default if None)
+            overlap: Overlap between chunks (uses config default if None)
+            
+        Yields:
+            str: Text chunks
+        """
         chunk_size = chunk_size or self.chunk_size
         overlap = overlap or self.chunk_overlap
         
-        if len(text) <= chunk_size:
-            return [text]
+        if self.token_model:
+            yield from self._chunk_tokens_stream(text_iter, chunk_size, overlap)
+            return
+        
+        # Boundaries must lie strictly past 80% of the chunk
+        min_offset = int(chunk_size * 0.8) + 1
         
-        chunks = []
+        buffer = ""
         start = 0
+        started = False
         
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
+        for piece in text_iter:
+            buffer = buffer[start:] + piece
+            start = 0
             
-            # Try to break at sentence or word boundary
-            if end < len(text):
-                last_period = chunk.rfind('.')
-                last_space = chunk.rfind(' ')
-                if last_period > chunk_size * 0.8:
-                    end = start + last_period + 1
-                elif last_space > chunk_size * 0.8:
-                    end = start + last_space
+            # Emit chunks while more text is known to follow them
+            while len(buffer) - start > chunk_size:
+                end = self._find_chunk_end(buffer, start, chunk_size, min_offset)
+                chunk_text = buffer[start:end].strip()
+                if chunk_text:
+                    yield chunk_text
+                start = end - overlap
+                started = True
+        
+        # Text that fits in a single chunk is returned as-is
+        if not started:
+            yield buffer
+            return
+        
+        while start < len(buffer):
+            end = start + chunk_size
+            if end < len(buffer):
+                end = self._find_chunk_end(buffer, start, chunk_size, min_offset)
             
-            chunk_text = text[start:end].strip()
+            chunk_text = buffer[start:end].strip()
             if chunk_text:
-                chunks.append(chunk_text)
+                yield chunk_text
             
             start = end - overlap
-            
-            if start >= len(text):
-                break
-        
-        return chunks
     
     def process_file(self, file_path: str) -> dict:
         """
         Process a single file: extract text and chunk it.
         
+        Text is streamed from the extractor into the chunker, so the full
+        document text is never held in memory at once.
+        
         Args:
             file_path: Path to the file to process
             
         Returns:
             dict: Processing results with chunks and metadata
         """
-        # Extract text
-        extraction_result = self.extract_text_from_file(file_path)
+        file_path = Path(file_path)
         
-        if not extraction_result["success"]:
+        error, metadata = self._check_file(file_path)
+        if error:
             return {
                 "success": False,
                 "chunks": [],
-                "metadata": extraction_result["metadata"],
-                "error": extraction_result["error"]
+                "metadata": metadata,
+                "error": error
             }
         
-        # Chunk text
+        text_length = 0
+        
+        def counted_text():
+            nonlocal text_length
+            for piece in self._iter_text(file_path):
+                text_length += len(piece)
+                yield piece
+        
+        # Extract and chunk text
         try:
-            chunks = self.chunk_text(extraction_result["text"])
-            
+            chunks = list(self.chunk_text_stream(counted_text()))
+        except Exception as e:
+            logger.error("Error processing %s: %s", file_path, e)
             return {
-                "success": True,
-                "chunks": chunks,
-                "metadata": {
-                    **extraction_result["metadata"],
-                    "chunk_count": len(chunks),
-                    "average_chunk_size": sum(len(chunk) for chunk in chunks) / len(chunks) if chunks else 0
-                },
-                "error": None
+                "success": False,
+                "chunks": [],
+                "metadata": metadata,
+                "error": f"Extraction error: {str(e)}"
             }
-            
-        except Exception as e:
-            logger.error(f"Error chunking text from {file_path}: {e}")
+        
+        if not any(chunk.strip() for chunk in chunks):
             return {
                 "success": False,
                 "chunks": [],
-                "metadata": extraction_result["metadata"],
-                "error": f"Chunking error: {str(e)}"
+                "metadata": metadata,
+                "error": f"No text content extracted from {file_path.name}"
             }
+        
+        return {
+            "success": True,
+            "chunks": chunks,
+            "metadata": {
+                **metadata,
+                "text_length": text_length,
+                "chunk_count": len(chunks),
+                "average_chunk_size": sum(len(chunk) for chunk in chunks) / len(chunks)
+            },
+            "error": None
+        }
     
-    def process_folder(self, folder_path: str) -> dict:
+    def _iter_supported_files(self, folder_path: Path):
+        """Recursively yield paths of supported files under a folder."""
+        pending_dirs = [str(folder_path)]
+        while pending_dirs:
+            directory = pending_dirs.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError as e:
+                # Skip unreadable directories rather than abandoning the whole folder
+                logger.warning("Skipping unreadable directory %s: %s", directory, e)
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending_dirs.append(entry.path)
+                    elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in self._ext_set:
+                        yield Path(entry.path)
+    
+    def process_folder(self, folder_path: str, file_filter=None) -> dict:
         """
         Process all supported files in a folder.
         
         Args:
             folder_path: Path to the folder containing documents
+            file_filter: Optional callable taking a file path; files for which it
+                returns False are skipped and listed in "skipped_files"
             
         Returns:
             dict: Processing results for all files
@@ -259,10 +461,8 @@ class DocumentProcessor:
         failed_files = []
         total_chunks = 0
         
-        # Find all supported files
-        supported_files = []
-        for ext in self.supported_extensions:
-            supported_files.extend(folder_path.rglob(f"*{ext}"))
+        # Find all supported files in a single traversal
+        supported_files = list(self._iter_supported_files(folder_path))
         
         if not supported_files:
             return {
@@ -273,23 +473,49 @@ class DocumentProcessor:
                 "error": f"No supported files found in {folder_path}"
             }
         
-        # Process each file
+        file_paths = []
+        skipped_files = []
         for file_path in supported_files:
-            logger.info(f"Processing file: {file_path}")
-            print(f"Text Chunking - Processing file: {file_path}")
-            result = self.process_file(str(file_path))
+            if file_filter is None or file_filter(str(file_path)):
+                file_paths.append(str(file_path))
+            else:
+                skipped_files.append(str(file_path))
+        
+        # Process each file, fanning out to worker processes when configured
+        workers = min(self.workers, len(file_paths))
+        if workers > 1:
+            processor_kwargs = {
+                "chunk_size": self.chunk_size,
+                "chunk_overlap": self.chunk_overlap,
+                "max_file_size_mb": self.max_file_size_mb,
+                "supported_extensions": self.supported_extensions,
+                "token_model": self.token_model
+            }
+            # Spawn rather than fork: the caller may hold threaded OpenAI/Chroma clients
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(processor_kwargs,)
+            ) as executor:
+                results = list(executor.map(_worker_process_file, file_paths, chunksize=WORKER_CHUNKSIZE))
+        else:
+            results = map(self.process_file, file_paths)
+        
+        for file_path, result in zip(file_paths, results):
+            logger.info("Processing file: %s", file_path)
             
             if result["success"]:
                 processed_files.append({
-                    "file_path": str(file_path),
+                    "file_path": file_path,
                     "chunks": result["chunks"],
                     "metadata": result["metadata"]
                 })
-                logger.info(f"metadata: {result['metadata']}")
+                logger.info("metadata: %s", result['metadata'])
                 total_chunks += len(result["chunks"])
             else:
                 failed_files.append({
-                    "file_path": str(file_path),
+                    "file_path": file_path,
                     "error": result["error"],
                     "metadata": result["metadata"]
                 })
@@ -298,6 +524,7 @@ class DocumentProcessor:
             "success": True,
             "processed_files": processed_files,
             "failed_files": failed_files,
+            "skipped_files": skipped_files,
             "total_chunks": total_chunks,
             "error": None
         }
@@ -306,20 +533,24 @@ def main():
     """Command line interface for document processing."""
     import argparse
     from config import Config
+    config = Config.load()
+    logging.basicConfig(level=config.LOG_LEVEL.upper())
     
     parser = argparse.ArgumentParser(description="Document Processing Tool")
     parser.add_argument("action", choices=["file", "folder"], help="Process a single file or folder")
     parser.add_argument("path", help="Path to file or folder to process")
     parser.add_argument("--output", help="Output file to save results (optional)")
+    parser.add_argument("--workers", type=int, default=config.PROCESSING_WORKERS,
+                        help="Number of worker processes for folder processing")
     
     args = parser.parse_args()
     
     # Initialize processor with configuration
     processor = DocumentProcessor(
-        chunk_size=Config.CHUNK_SIZE,
-        chunk_overlap=Config.CHUNK_OVERLAP,
-        max_file_size_mb=Config.MAX_FILE_SIZE_MB,
-        supported_extensions=Config.SUPPORTED_EXTENSIONS
+        **config.get_chunking_settings(),
+        max_file_size_mb=config.MAX_FILE_SIZE_MB,
+        supported_extensions=config.SUPPORTED_EXTENSIONS,
+        workers=args.workers
     )
     
     print(f"🔧 Document Processor")
@@ -327,6 +558,7 @@ def main():
     print(f"Path: {args.path}")
     print(f"Chunk Size: {processor.chunk_size}")
     print(f"Chunk Overlap: {processor.chunk_overlap}")
+    print(f"Chunk Unit: {'tokens' if processor.token_model else 'characters'}")
     print("=" * 50)
     
     # Process based on action
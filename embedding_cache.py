@@ -0,0 +1,120 @@
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cache file kept alongside the vector store in CHROMA_PERSIST_DIRECTORY
+EMBEDDING_CACHE_FILENAME = "embed_cache.db"
+
+# SQLite caps the number of host parameters per statement
+_MAX_SQL_VARIABLES = 500
+
+class EmbeddingCache:
+    """Persistent on-disk cache mapping (model, text) to float32 embedding vectors."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (or create) the embedding cache database.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Shared by the CLI and the Streamlit app's worker threads
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings_f32 "
+            "(key TEXT PRIMARY KEY, dim INTEGER NOT NULL, embedding BLOB NOT NULL)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Build the cache key for a text embedded with a given model."""
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list) -> dict:
+        """
+        Look up cached embeddings.
+
+        Args:
+            keys: Cache keys to look up
+
+        Returns:
+            dict: Mapping of key to float32 embedding for every key found in the cache
+        """
+        found = {}
+        for start in range(0, len(keys), _MAX_SQL_VARIABLES):
+            batch = keys[start:start + _MAX_SQL_VARIABLES]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT key, dim, embedding FROM embeddings_f32 WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+            for key, dim, blob in rows:
+                embedding = np.frombuffer(blob, dtype=np.float32)
+                if embedding.shape[0] == dim:
+                    found[key] = embedding
+        return found
+
+    def put_many(self, items: dict) -> None:
+        """
+        Store embeddings in the cache.
+
+        Args:
+            items: Mapping of cache key to embedding
+        """
+        if not items:
+            return
+        rows = []
+        for key, embedding in items.items():
+            embedding = np.asarray(embedding, dtype=np.float32)
+            rows.append((key, embedding.shape[0], embedding.tobytes()))
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings_f32 (key, dim, embedding) VALUES (?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+
+    def get_or_compute(self, texts: list, model: str, client) -> np.ndarray:
+        """
+        Get embeddings for texts, calling OpenAI only for texts not already cached.
+
+        Args:
+            texts: Texts to embed
+            model: OpenAI embedding model name
+            client: OpenAI client used for cache misses
+            
+        Returns:
+            np.ndarray: (len(texts), dim) float32 embedding matrix
+        """
+        keys = [self.make_key(model, text) for text in texts]
+        cached = self.get_many(keys)
+        embeddings = [cached.get(key) for key in keys]
+
+        missing = [j for j, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            response = client.embeddings.create(
+                model=model,
+                input=[texts[j] for j in missing]
+            )
+            for item in response.data:
+                embeddings[missing[item.index]] = np.asarray(item.embedding, dtype=np.float32)
+            self.put_many({keys[j]: embeddings[j] for j in missing})
+
+        return np.vstack(embeddings)
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        self.conn.close()
@@ -3,14 +3,14 @@
 Document Ingestion CLI - Handles adding documents to the RAG system
 """
 
-import chromadb
-from openai import OpenAI
+import shutil
 from pathlib import Path
 from dotenv import load_dotenv
 import logging
 import argparse
 import sys
-from document_ingestion import DocumentIngestion
+from embedding_cache import EmbeddingCache, EMBEDDING_CACHE_FILENAME
+from ingestion_manifest import IngestionManifest, MANIFEST_FILENAME
 
 # Load environment variables
 load_dotenv()
@@ -20,43 +20,85 @@ load_dotenv()
 logging.disable(logging.CRITICAL)
 logger = logging.getLogger(__name__)
 
+# Heavy dependencies (chromadb, openai, PyMuPDF, pandas) are imported where they
+# are needed so that quick actions like stats and clear start fast
+
+def _open_chroma(config):
+    """Open the configured Chroma collection, creating it if needed."""
+    import chromadb
+    
+    chroma_client = chromadb.PersistentClient(path=config.CHROMA_PERSIST_DIRECTORY)
+    collection = chroma_client.get_or_create_collection(
+        config.CHROMA_COLLECTION_NAME, metadata=config.get_collection_metadata()
+    )
+    return chroma_client, collection
+
+def _clear_persist_directory(config):
+    """
+    Delete the vector store, ingestion manifest and query cache from disk.
+    
+    Removing the files is much faster than deleting a large collection
+    through Chroma. The embedding cache is kept, since embeddings of
+    unchanged text stay valid and make re-ingesting cheap.
+    """
+    persist_dir = Path(config.CHROMA_PERSIST_DIRECTORY)
+    if persist_dir.exists():
+        for entry in persist_dir.iterdir():
+            # Also keeps the SQLite -wal/-shm side files
+            if entry.name.startswith(EMBEDDING_CACHE_FILENAME):
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry)
+            else:
+                entry.unlink()
+    persist_dir.mkdir(parents=True, exist_ok=True)
+
+def _print_batch_jobs(result):
+    """Print the Batch API jobs of a folder ingest so failed or unfinished ones can be followed up."""
+    for job in result.get("batch_jobs", []):
+        if job["error"]:
+            print(f"⚠️  Embedding batch {job['batch_id'] or '(not submitted)'} ({job['status']}, "
+                  f"{job['requests']} requests): {job['error']}")
+        else:
+            print(f"🧾 Embedding batch {job['batch_id']} ({job['status']}, {job['requests']} requests)")
+
 def initialize_ingestion_system(config):
     """Initialize the document ingestion system."""
+    from document_ingestion import DocumentIngestion
+    from openai_clients import create_openai_client
+    
     # Check API key from config/environment only
     api_key = config.OPENAI_API_KEY
     if not api_key:
         raise ValueError("OpenAI API key not found in environment variables or config")
     
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
+    # Initialize OpenAI client with a pooled, keep-alive HTTP connection
+    # SDK retries are off: DocumentIngestion retries embedding and Batch API calls itself
+    # (honouring Retry-After), and stacking both multiplies attempts per failing request
+    client = create_openai_client(api_key, max_retries=0)
     
     # Initialize Chroma with config
     db_path = config.CHROMA_PERSIST_DIRECTORY
-    collection_name = config.CHROMA_COLLECTION_NAME
-    
-    chroma_client = chromadb.PersistentClient(path=db_path)
-    try:
-        collection = chroma_client.get_collection(collection_name)
-    except:
-        collection = chroma_client.create_collection(collection_name)
+    chroma_client, collection = _open_chroma(config)
     
     # Initialize document ingestion system with config parameters
     doc_ingestion = DocumentIngestion(
         openai_client=client,
         chroma_collection=collection,
         embedding_model=config.CHROMA_EMBEDDING_MODEL,
-        chunk_size=config.CHUNK_SIZE,
-        chunk_overlap=config.CHUNK_OVERLAP,
+        **config.get_chunking_settings(),
         max_file_size_mb=config.MAX_FILE_SIZE_MB,
-        supported_extensions=config.SUPPORTED_EXTENSIONS
+        supported_extensions=config.SUPPORTED_EXTENSIONS,
+        max_concurrent_requests=config.EMBEDDING_MAX_CONCURRENCY,
+        processing_workers=config.PROCESSING_WORKERS,
+        embedding_cache=EmbeddingCache(str(Path(db_path) / EMBEDDING_CACHE_FILENAME)),
+        manifest=IngestionManifest(str(Path(db_path) / MANIFEST_FILENAME))
     )
     
     logger.info("Document ingestion system initialized successfully")
     return doc_ingestion, chroma_client, collection
 
 def main():
-    from config import Config
-
     """Command line interface for document ingestion."""
     parser = argparse.ArgumentParser(
         description="Document Ingestion System",
@@ -65,45 +107,62 @@ def main():
             python ingest_documents.py ingest-default              # Process default folder from config
             python ingest_documents.py add-folder                  # Process default folder from config  
             python ingest_documents.py add-folder --path docs/     # Process specific folder
+            python ingest_documents.py add-folder --batch-api      # Embed a large folder via the Batch API
             python ingest_documents.py add-file --path file.pdf    # Process specific file
             python ingest_documents.py stats                       # Show database statistics
-            python ingest_documents.py clear                       # Clear database
+            python ingest_documents.py clear --yes                 # Clear database
                     """,
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
     parser.add_argument("action", choices=["add-file", "add-folder", "ingest-default", "stats", "clear"], 
                        help="Action to perform")
     parser.add_argument("--path", help="Path to file or folder (for add-file/add-folder). Uses default from config if not specified.")
+    parser.add_argument("--batch-api", action="store_true",
+                       help="Embed large folders through the OpenAI Batch API (cheaper, completes asynchronously within 24h)")
+    parser.add_argument("--yes", action="store_true",
+                       help="Confirm the clear action, which deletes everything in CHROMA_PERSIST_DIRECTORY except the embedding cache")
     
     args = parser.parse_args()
     
+    from config import Config
+    config = Config.load()
+    
     print("📚 Document Ingestion System")
     print("=" * 50)
     
     # Show configuration info
-    default_path = Config.DOCUMENTS_FOLDER_PATH
+    default_path = config.DOCUMENTS_FOLDER_PATH
     if default_path:
         print(f"📂 Default documents folder: {default_path}")
     else:
         print("📂 No default documents folder configured")
     print("=" * 50)
     
-    # Initialize ingestion system
-    try:
-        doc_ingestion, chroma_client, collection = initialize_ingestion_system(Config)
-        print("✅ Document ingestion system initialized!")
-        print(f"📡 Using API key from environment variables")
-        print("=" * 50)
+    # stats only needs the vector store, and clear works on the files directly
+    if args.action == "stats":
+        try:
+            chroma_client, collection = _open_chroma(config)
+        except Exception as e:
+            print(f"❌ System Error: {e}")
+            sys.exit(1)
+    
+    elif args.action != "clear":
+        # Initialize ingestion system
+        try:
+            doc_ingestion, chroma_client, collection = initialize_ingestion_system(config)
+            print("✅ Document ingestion system initialized!")
+            print(f"📡 Using API key from environment variables")
+            print("=" * 50)
         
-    except ValueError as e:
-        print(f"❌ Configuration Error: {e}")
-        print("💡 Please set your OPENAI_API_KEY environment variable:")
-        print("   export OPENAI_API_KEY=your_api_key_here")
-        print("   or create a .env file with OPENAI_API_KEY=your_api_key_here")
-        sys.exit(1)
-    except Exception as e:
-        print(f"❌ System Error: {e}")
-        sys.exit(1)
+        except ValueError as e:
+            print(f"❌ Configuration Error: {e}")
+            print("💡 Please set your OPENAI_API_KEY environment variable:")
+            print("   export OPENAI_API_KEY=your_api_key_here")
+            print("   or create a .env file with OPENAI_API_KEY=your_api_key_here")
+            sys.exit(1)
+        except Exception as e:
+            print(f"❌ System Error: {e}")
+            sys.exit(1)
     
     # Execute the requested action
     if args.action == "add-file":
@@ -124,7 +183,7 @@ def main():
     
     elif args.action == "add-folder":
         # Use provided path or default from config
-        folder_path = args.path if args.path else Config.DOCUMENTS_FOLDER_PATH
+        folder_path = args.path if args.path else config.DOCUMENTS_FOLDER_PATH
         
         if not folder_path:
             print("❌ Error: No folder path specified and no default path configured")
@@ -144,12 +203,17 @@ def main():
             print(f"📁 Processing default folder: {folder_path}")
             print("💡 Using default path from config (DOCUMENTS_FOLDER_PATH)")
         
-        result = doc_ingestion.process_and_add_folder(folder_path)
+        if args.batch_api:
+            result = doc_ingestion.process_and_add_folder_batch(folder_path)
+        else:
+            result = doc_ingestion.process_and_add_folder(folder_path)
         
         if result["success"]:
             print(f"✅ {result['message']}")
             print(f"📊 Files processed: {result['files_processed']}")
             print(f"📊 Total chunks added: {result['total_chunks_added']}")
+            if result['skipped_files']:
+                print(f"⏭️  Skipped unchanged files: {len(result['skipped_files'])}")
             
             if result['failed_files']:
                 print(f"❌ Failed files ({len(result['failed_files'])}):")
@@ -157,13 +221,14 @@ def main():
                     print(f"   - {Path(failed['file_path']).name}: {failed['error']}")
                 if len(result['failed_files']) > 5:
                     print(f"   ... and {len(result['failed_files']) - 5} more")
+            _print_batch_jobs(result)
         else:
             print(f"❌ {result['message']}")
             sys.exit(1)
     
     elif args.action == "ingest-default":
         # Use default folder from config
-        default_path = Config.DOCUMENTS_FOLDER_PATH
+        default_path = config.DOCUMENTS_FOLDER_PATH
         
         if not default_path:
             print("❌ Error: No default documents folder configured")
@@ -180,12 +245,17 @@ def main():
         print(f"📁 Processing default documents folder: {default_path}")
         print("💡 Using DOCUMENTS_FOLDER_PATH from config")
         
-        result = doc_ingestion.process_and_add_folder(default_path)
+        if args.batch_api:
+            result = doc_ingestion.process_and_add_folder_batch(default_path)
+        else:
+            result = doc_ingestion.process_and_add_folder(default_path)
         
         if result["success"]:
             print(f"✅ {result['message']}")
             print(f"📊 Files processed: {result['files_processed']}")
             print(f"📊 Total chunks added: {result['total_chunks_added']}")
+            if result['skipped_files']:
+                print(f"⏭️  Skipped unchanged files: {len(result['skipped_files'])}")
             
             if result['failed_files']:
                 print(f"❌ Failed files ({len(result['failed_files'])}):")
@@ -193,6 +263,7 @@ def main():
                     print(f"   - {Path(failed['file_path']).name}: {failed['error']}")
                 if len(result['failed_files']) > 5:
                     print(f"   ... and {len(result['failed_files']) - 5} more")
+            _print_batch_jobs(result)
         else:
             print(f"❌ {result['message']}")
             sys.exit(1)
@@ -207,12 +278,15 @@ def main():
             sys.exit(1)
     
     elif args.action == "clear":
+        if not args.yes:
+            print(f"❌ This deletes all ingested documents in {config.CHROMA_PERSIST_DIRECTORY}")
+            print("💡 Re-run with --yes to confirm: python ingest_documents.py clear --yes")
+            sys.exit(1)
+        
         print("🗑️  Clearing database...")
         try:
-            collection_name = Config.CHROMA_COLLECTION_NAME
-            chroma_client.delete_collection(collection_name)
-            chroma_client.create_collection(collection_name)
-            print("✅ Database cleared successfully")
+            _clear_persist_directory(config)
+            print("✅ Database cleared successfully (embedding cache kept)")
         except Exception as e:
             print(f"❌ Error clearing database: {e}")
             sys.exit(1)
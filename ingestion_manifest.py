@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Manifest file kept alongside the vector store in CHROMA_PERSIST_DIRECTORY
+MANIFEST_FILENAME = "ingested.sqlite"
+
+def last_ingested_at(db_path: str) -> float:
+    """
+    Read when a file was last recorded in a manifest, without creating it.
+
+    Args:
+        db_path: Path to the manifest database file
+
+    Returns:
+        float: Unix time of the latest recorded ingestion, or 0.0 if there is none
+    """
+    try:
+        conn = sqlite3.connect(f"{Path(db_path).as_uri()}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT MAX(recorded_at) FROM files").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0.0
+    return row[0] or 0.0
+
+class IngestionManifest:
+    """Records which files have been ingested so unchanged files can be skipped."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (or create) the manifest database.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files "
+            "(path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL, "
+            "sha256 TEXT NOT NULL, chunk_ids TEXT NOT NULL, settings TEXT NOT NULL DEFAULT '', "
+            "recorded_at REAL NOT NULL DEFAULT 0)"
+        )
+        # Manifests written by older versions; files without settings are re-ingested once
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(files)")]
+        if "settings" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN settings TEXT NOT NULL DEFAULT ''")
+        if "recorded_at" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN recorded_at REAL NOT NULL DEFAULT 0")
+        self.conn.commit()
+
+    @staticmethod
+    def file_sha256(file_path: str) -> str:
+        """Hash a file's contents without reading it into memory at once."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def is_unchanged(self, file_path: str, settings: str = "") -> bool:
+        """
+        Check whether a file matches its last recorded ingestion.
+
+        Uses (mtime, size) as a fast path and only hashes the file when
+        those differ from the recorded values.
+
+        Args:
+            file_path: Path to the file
+            settings: Fingerprint of the ingestion settings (embedding model, chunking, filters)
+
+        Returns:
+            bool: True if the file was ingested before with the same settings and its content has not changed
+        """
+        row = self.conn.execute(
+            "SELECT mtime, size, sha256, settings FROM files WHERE path = ?", (file_path,)
+        ).fetchone()
+        if row is None:
+            return False
+
+        mtime, size, sha256, recorded_settings = row
+        if recorded_settings != settings:
+            return False
+
+        stat = os.stat(file_path)
+        if stat.st_mtime == mtime and stat.st_size == size:
+            return True
+
+        if self.file_sha256(file_path) != sha256:
+            return False
+
+        # Content is identical (e.g. the file was touched); refresh the fast-path fields
+        self.conn.execute(
+            "UPDATE files SET mtime = ?, size = ? WHERE path = ?",
+            (stat.st_mtime, stat.st_size, file_path)
+        )
+        self.conn.commit()
+        return True
+
+    def record(self, file_path: str, chunk_ids: list, settings: str = "") -> None:
+        """
+        Record a successful ingestion of a file.
+
+        Args:
+            file_path: Path to the file
+            chunk_ids: IDs of the chunks added to the vector store
+            settings: Fingerprint of the ingestion settings the chunks were produced with
+        """
+        stat = os.stat(file_path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, mtime, size, sha256, chunk_ids, settings, recorded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (file_path, stat.st_mtime, stat.st_size, self.file_sha256(file_path), json.dumps(chunk_ids),
+             settings, time.time())
+        )
+        self.conn.commit()
+
+    def clear(self) -> None:
+        """Forget all recorded files."""
+        self.conn.execute("DELETE FROM files")
+        self.conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        self.conn.close()
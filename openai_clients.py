@@ -0,0 +1,45 @@
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+# Keep-alive connection pool reused by every request a client makes
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+HTTP_TIMEOUT = httpx.Timeout(60.0)
+
+def create_openai_client(api_key: str, max_retries: int = 2) -> OpenAI:
+    """
+    Create an OpenAI client backed by a pooled, keep-alive HTTP connection.
+
+    Args:
+        api_key: OpenAI API key
+        max_retries: Retries the client makes on transient failures
+
+    Returns:
+        OpenAI: Client instance
+    """
+    return OpenAI(
+        api_key=api_key,
+        http_client=httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+        max_retries=max_retries
+    )
+
+def create_async_openai_client(client: OpenAI) -> AsyncOpenAI:
+    """
+    Create an async client mirroring a sync client's settings, with its own connection pool.
+
+    The async pool is bound to the event loop it is first used on, so create
+    one per asyncio.run and close it with `async with`.
+
+    Args:
+        client: Sync OpenAI client to copy settings from
+
+    Returns:
+        AsyncOpenAI: Client instance
+    """
+    return AsyncOpenAI(
+        api_key=client.api_key,
+        organization=client.organization,
+        base_url=client.base_url,
+        timeout=client.timeout,
+        max_retries=client.max_retries,
+        http_client=httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    )
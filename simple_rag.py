@@ -1,17 +1,39 @@
+import atexit
+import json
 import chromadb
-from openai import OpenAI
+import threading
+import numpy as np
+import tiktoken
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 import logging
 import argparse
 import sys
+from embedding_cache import EmbeddingCache, EMBEDDING_CACHE_FILENAME
+from ingestion_manifest import MANIFEST_FILENAME, last_ingested_at
+from openai_clients import create_openai_client
 
 # Load environment variables
 load_dotenv()
 
-# Simple logging setup
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+# Fixed system prompt; kept identical across requests so OpenAI can cache the prompt prefix
+STATIC_INSTRUCTIONS = (
+    "You answer questions using context retrieved from the user's documents. "
+    "Base your answer only on the provided context. "
+    "If you can't answer based on the context, say so."
+)
+
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information to answer your question."
+
+# Maximum number of query embeddings kept in memory (least recently used are evicted)
+EMBEDDING_CACHE_SIZE = 1024
+
+# Maximum number of answered questions kept for semantic lookup (oldest are evicted)
+QUERY_CACHE_SIZE = 512
  
 class SimpleRAG:
     """A simple RAG system that handles document ingestion and querying."""
@@ -29,39 +51,219 @@ class SimpleRAG:
         self.chunk_size = config.CHUNK_SIZE
         self.chunk_overlap = config.CHUNK_OVERLAP
         
-        # Initialize OpenAI client
-        self.client = OpenAI(api_key=self.api_key)
+        # Initialize OpenAI client with a pooled, keep-alive HTTP connection
+        self.client = create_openai_client(self.api_key)
         
         # Initialize Chroma with config
         db_path = config.CHROMA_PERSIST_DIRECTORY
         collection_name = config.CHROMA_COLLECTION_NAME
         
         self.chroma_client = chromadb.PersistentClient(path=db_path)
+        self.collection = self.chroma_client.get_or_create_collection(
+            collection_name, metadata=config.get_collection_metadata()
+        )
+        
+        # Answer-path settings resolved once; the prompt and tokenizer never change per call
+        self._chat_model = config.OPENAI_MODEL
+        self._temperature = config.OPENAI_TEMPERATURE
+        self._max_context_tokens = config.MAX_CONTEXT_TOKENS
+        self._max_distance = config.MAX_RETRIEVAL_DISTANCE
+        self._system_message = {"role": "system", "content": STATIC_INSTRUCTIONS}
+        self._encoder = self._load_encoder(config.OPENAI_MODEL)
+        
+        # Shared worker for the collection-state check that overlaps the question embedding;
+        # a plain thread keeps answer_question callable from inside a running event loop
+        self._state_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-state")
+        
+        # Persistent embedding cache shared with the ingestion CLI
+        self.embedding_cache = EmbeddingCache(str(Path(db_path) / EMBEDDING_CACHE_FILENAME))
+        
+        # LRU cache of (model, text) -> embedding, shared across Streamlit sessions
+        self._recent_embeddings = OrderedDict()
+        self._recent_embeddings_lock = threading.Lock()
+        
+        # Answers to earlier questions, matched by cosine similarity of their embeddings;
+        # valid only while the collection size and the manifest's last ingestion are unchanged
+        self._manifest_path = Path(db_path) / MANIFEST_FILENAME
+        self._qcache_vecs_path = Path(db_path) / "query_cache.npy"
+        self._qcache_answers_path = Path(db_path) / "query_cache.json"
+        self._qcache_lock = threading.Lock()
+        self._load_query_cache()
+        atexit.register(self.save_query_cache)
+    
+    def _collection_state(self) -> tuple:
+        """Return (chunk count, last ingestion time), which change whenever documents do."""
+        return self.collection.count(), last_ingested_at(self._manifest_path)
+    
+    def _load_query_cache(self) -> None:
+        """Load saved answers, discarding them if the models or the collection changed since."""
+        self._qcache_vecs = None
+        self._qcache_answers = []
+        self._qcache_collection_state = self._collection_state()
         try:
-            self.collection = self.chroma_client.get_collection(collection_name)
-        except:
-            self.collection = self.chroma_client.create_collection(collection_name)      
+            with open(self._qcache_answers_path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if (saved["model"] != self.config.CHROMA_EMBEDDING_MODEL
+                    or saved["chat_model"] != self._chat_model
+                    or (saved["document_count"], saved["last_ingested_at"]) != self._qcache_collection_state):
+                return
+            vecs = np.load(self._qcache_vecs_path)
+            if len(vecs) == len(saved["answers"]) and len(vecs):
+                self._qcache_vecs = vecs.astype(np.float32, copy=False)
+                self._qcache_answers = saved["answers"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug("No usable query cache loaded: %s", e)
+    
+    def save_query_cache(self) -> None:
+        """Write the semantic query cache to the Chroma persist directory."""
+        with self._qcache_lock:
+            if self._qcache_vecs is None:
+                return
+            try:
+                np.save(self._qcache_vecs_path, self._qcache_vecs)
+                with open(self._qcache_answers_path, "w", encoding="utf-8") as f:
+                    json.dump({
+                        "model": self.config.CHROMA_EMBEDDING_MODEL,
+                        "chat_model": self._chat_model,
+                        "document_count": self._qcache_collection_state[0],
+                        "last_ingested_at": self._qcache_collection_state[1],
+                        "answers": self._qcache_answers
+                    }, f)
+            except Exception as e:
+                logger.error("Error saving query cache: %s", e)
+    
+    def _sync_query_cache(self, collection_state: tuple) -> None:
+        """Drop cached answers if documents were ingested or removed since they were stored."""
+        with self._qcache_lock:
+            if collection_state != self._qcache_collection_state:
+                self._qcache_vecs = None
+                self._qcache_answers = []
+                self._qcache_collection_state = collection_state
+    
+    def _lookup_query_cache(self, query_vec: np.ndarray):
+        """Return the cached result of the most similar earlier question, if similar enough."""
+        with self._qcache_lock:
+            if self._qcache_vecs is None or self._qcache_vecs.shape[1] != query_vec.shape[0]:
+                return None
+            sims = self._qcache_vecs @ query_vec
+            best = int(sims.argmax())
+            if sims[best] < self.config.SEMANTIC_CACHE_THRESHOLD:
+                return None
+            return self._qcache_answers[best]
+    
+    def _store_query_cache(self, query_vec: np.ndarray, result: dict) -> None:
+        """Remember an answer for semantically similar future questions."""
+        with self._qcache_lock:
+            if self._qcache_vecs is None or self._qcache_vecs.shape[1] != query_vec.shape[0]:
+                self._qcache_vecs = query_vec[np.newaxis, :]
+                self._qcache_answers = [result]
+            else:
+                self._qcache_vecs = np.vstack([self._qcache_vecs, query_vec])[-QUERY_CACHE_SIZE:]
+                self._qcache_answers = (self._qcache_answers + [result])[-QUERY_CACHE_SIZE:]
     
-    def get_embedding(self, text: str) -> list:
-        """Get embedding for text using OpenAI."""
+    def _remember_embedding(self, key: tuple, embedding: np.ndarray) -> None:
+        """Add an embedding to the in-memory LRU cache, evicting the least recently used."""
+        # Shared through the cache, so guard against in-place edits by callers
+        embedding.flags.writeable = False
+        with self._recent_embeddings_lock:
+            self._recent_embeddings[key] = embedding
+            self._recent_embeddings.move_to_end(key)
+            if len(self._recent_embeddings) > EMBEDDING_CACHE_SIZE:
+                self._recent_embeddings.popitem(last=False)
+    
+    def warm_embedding_cache(self, texts: list) -> None:
+        """
+        Embed texts ahead of time so later questions with the same text skip the API call.
+        
+        Texts missing from the on-disk cache are embedded in a single batched request.
+        
+        Args:
+            texts: Questions expected to be asked
+        """
+        model = self.config.CHROMA_EMBEDDING_MODEL
         try:
-            response = self.client.embeddings.create(
-                model=self.config.CHROMA_EMBEDDING_MODEL,
-                input=text
-            )
-            return response.data[0].embedding
+            embeddings = self.embedding_cache.get_or_compute(texts, model, self.client)
         except Exception as e:
-            logger.error(f"Error getting embedding: {e}")
+            logger.error("Error warming embedding cache: %s", e)
+            return
+        
+        for text, embedding in zip(texts, embeddings):
+            self._remember_embedding((model, text), embedding)
+    
+    def get_embedding(self, text: str) -> np.ndarray:
+        """Get a float32 embedding for text, checking the in-memory and on-disk caches before calling OpenAI."""
+        key = (self.config.CHROMA_EMBEDDING_MODEL, text)
+        with self._recent_embeddings_lock:
+            if key in self._recent_embeddings:
+                self._recent_embeddings.move_to_end(key)
+                return self._recent_embeddings[key]
+        
+        try:
+            embedding = self.embedding_cache.get_or_compute(
+                [text], self.config.CHROMA_EMBEDDING_MODEL, self.client
+            )[0]
+            self._remember_embedding(key, embedding)
+            return embedding
+        except Exception as e:
+            logger.error("Error getting embedding: %s", e)
             return None   
 
     
+    @staticmethod
+    def _load_encoder(model: str):
+        """Load the tokenizer used to budget the prompt context for a chat model."""
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    
+    def _select_context(self, documents: list, distances: list) -> list:
+        """
+        Pick retrieved chunks for the prompt, most relevant first, within the context token budget.
+        
+        Chunks farther than MAX_RETRIEVAL_DISTANCE are dropped. If even the
+        closest chunk exceeds the budget, it is cut to fit.
+        
+        Args:
+            documents: Retrieved chunk texts, ordered by relevance
+            distances: Distance of each chunk from the question
+            
+        Returns:
+            list: (result index, text) pairs to include in the prompt
+        """
+        encoder = self._encoder
+        budget = self._max_context_tokens
+        selected = []
+        for i, document in enumerate(documents):
+            if distances and distances[i] > self._max_distance:
+                break
+            tokens = encoder.encode(document, disallowed_special=())
+            if len(tokens) > budget:
+                if not selected:
+                    selected.append((i, encoder.decode(tokens[:budget])))
+                break
+            budget -= len(tokens)
+            selected.append((i, document))
+        return selected
+    
     def answer_question(self, question: str, n_results: int = None) -> dict:
-        """Answer a question using RAG."""
+        """Answer a question using RAG, reusing the answer to a near-identical earlier question."""
         n_results = n_results or self.config.DEFAULT_RETRIEVAL_K
+        use_query_cache = n_results == self.config.DEFAULT_RETRIEVAL_K
         
         try:
-            # Get query embedding
+            # Get query embedding, checking the collection state concurrently
+            state_future = self._state_executor.submit(self._collection_state)
             query_embedding = self.get_embedding(question)
+            collection_state = state_future.result()
+            self._sync_query_cache(collection_state)
+            document_count = collection_state[0]
+            if document_count == 0:
+                return {
+                    "success": True,
+                    "answer": NO_CONTEXT_ANSWER,
+                    "sources": []
+                }
             if query_embedding is None:
                 return {
                     "success": False,
@@ -69,46 +271,66 @@ class SimpleRAG:
                     "sources": []
                 }
             
+            # Stored vectors are unit length, so similarity is a plain dot product
+            query_vec = query_embedding / (np.linalg.norm(query_embedding) + 1e-12)
+            if use_query_cache:
+                cached = self._lookup_query_cache(query_vec)
+                if cached is not None:
+                    logger.debug("Semantic cache hit for question: %s", question)
+                    return {
+                        "success": True,
+                        "answer": cached["answer"],
+                        "sources": cached["sources"]
+                    }
+            
             # Search collection for relevant documents
             results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results
+                query_embeddings=[query_vec],
+                n_results=min(n_results, document_count),
+                include=["documents", "metadatas", "distances"]
             )
             
-            if not results['documents'] or not results['documents'][0]:
+            selected = []
+            if results['documents'] and results['documents'][0]:
+                selected = self._select_context(
+                    results['documents'][0],
+                    results['distances'][0] if results['distances'] else None
+                )
+            
+            if not selected:
                 return {
                     "success": True,
-                    "answer": "I couldn't find any relevant information to answer your question.",
+                    "answer": NO_CONTEXT_ANSWER,
                     "sources": []
                 }
             
-            # Create context from search results
-            context = "\n\n".join(results['documents'][0])
-            
-            # Generate answer using GPT
-            prompt = f"""Based on the following context from documents, answer the question. If you can't answer based on the context, say so.
-
-                    Context: {context}
-                    Question: {question}
-                    Answer:"""
+            # Create context from the chunks that fit the token budget
+            context = "\n\n".join(text for _, text in selected)
             
+            # Generate answer using GPT; the variable parts come last so the prefix stays cacheable
             response = self.client.chat.completions.create(
-                model=self.config.OPENAI_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=self.config.OPENAI_TEMPERATURE
+                model=self._chat_model,
+                messages=[
+                    self._system_message,
+                    {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}
+                ],
+                temperature=self._temperature
             )
             
             answer = response.choices[0].message.content
             
             # Format sources
             sources = []
-            for i in range(len(results['documents'][0])):
+            for i, _ in selected:
                 sources.append({
                     'content': results['documents'][0][i],
                     'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
                     'distance': results['distances'][0][i] if results['distances'] else None
                 })
             
+            if use_query_cache:
+                self._store_query_cache(query_vec, {"answer": answer, "sources": sources})
+            
             return {
                 "success": True,
                 "answer": answer,
@@ -116,7 +338,7 @@ class SimpleRAG:
             }
             
         except Exception as e:
-            logger.error(f"Error answering question: {e}")
+            logger.error("Error answering question: %s", e)
             return {
                 "success": False,
                 "answer": f"Error generating answer: {str(e)}",
@@ -127,6 +349,8 @@ class SimpleRAG:
 def main():
     """Command line interface for the RAG system."""
     from config import Config
+    config = Config.load()
+    logging.basicConfig(level=config.LOG_LEVEL.upper())
     
     parser = argparse.ArgumentParser(description="Simple RAG System - Interactive Q&A")
     parser.add_argument("--question", help="Question to ask (optional - will prompt if not provided)")
@@ -138,7 +362,7 @@ def main():
     
     # Initialize RAG system
     try:
-        rag = SimpleRAG(Config)
+        rag = SimpleRAG(config)
         print("✅ RAG system initialized!")
         print(f"📡 Using API key from environment variables")
         print("=" * 50)
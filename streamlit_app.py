@@ -13,15 +13,49 @@ st.set_page_config(
     layout="wide"
 )
 
+SAMPLE_QUESTIONS = [
+    "What is the main topic?",
+    "Can you summarize the key points?",
+    "What are the technical specifications?",
+    "How does this work?",
+    "What are the benefits?"
+]
+
 # Initialize RAG system
 @st.cache_resource
 def initialize_rag():
     """Initialize RAG system with caching."""
     try:
-        return SimpleRAG(Config)
+        rag = SimpleRAG(Config.load())
     except Exception as e:
         st.error(f"Failed to initialize RAG system: {e}")
         st.stop()
+    
+    # Embed the sample questions in one request so clicking them skips the embedding call
+    rag.warm_embedding_cache(SAMPLE_QUESTIONS)
+    return rag
+
+def use_sample_question(question: str):
+    """Put a sample question into the question box."""
+    st.session_state.question = question
+
+class AnswerError(Exception):
+    """A question could not be answered; raised so the failure is not cached."""
+
+# Memoize answers so repeated questions (e.g. sample questions) return instantly
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def answer_question(question: str) -> dict:
+    """Answer a question with the shared RAG system, caching successful results."""
+    result = initialize_rag().answer_question(question)
+    if not result["success"]:
+        raise AnswerError(result["answer"])
+    return result
+
+# Refreshed at most every 30s rather than on every widget interaction
+@st.cache_data(ttl=30, show_spinner=False)
+def document_count() -> int:
+    """Count the chunks stored in the vector database."""
+    return initialize_rag().collection.count()
 
 def main():
     st.title("🤖 RAG Question & Answer System")
@@ -43,16 +77,19 @@ def main():
         question = st.text_area(
             "Enter your question:",
             placeholder="What would you like to know about your documents?",
-            height=100
+            height=100,
+            key="question"
         )
         
         # Ask button
         if st.button("🔍 Get Answer", type="primary", use_container_width=True):
             if question.strip():
-                with st.spinner("Thinking..."):
-                    result = rag.answer_question(question.strip())
-                
-                if result["success"]:
+                try:
+                    with st.spinner("Thinking..."):
+                        result = answer_question(question.strip())
+                except AnswerError as e:
+                    st.error(f"❌ {e}")
+                else:
                     st.subheader("🤖 Answer")
                     st.write(result["answer"])
                     
@@ -62,8 +99,6 @@ def main():
                         for i, source in enumerate(result["sources"][:3], 1):
                             with st.expander(f"Source {i}: {source['metadata'].get('filename', 'Unknown')}"):
                                 st.text(source["content"][:500] + "..." if len(source["content"]) > 500 else source["content"])
-                else:
-                    st.error(f"❌ {result['answer']}")
             else:
                 st.warning("Please enter a question!")
     
@@ -72,11 +107,15 @@ def main():
         
         # Get database stats
         try:
-            count = rag.collection.count()
+            count = document_count()
             st.metric("Documents in Database", count)
         except:
             st.metric("Documents in Database", "Unknown")
         
+        if st.button("🧹 Clear cached answers", use_container_width=True):
+            answer_question.clear()
+            st.toast("Cached answers cleared")
+        
         st.markdown("---")
         
         st.markdown("""
@@ -96,23 +135,9 @@ def main():
         
         # Sample questions
         st.subheader("💡 Sample Questions")
-        sample_questions = [
-            "What is the main topic?",
-            "Can you summarize the key points?",
-            "What are the technical specifications?",
-            "How does this work?",
-            "What are the benefits?"
-        ]
-        
-        for q in sample_questions:
-            if st.button(q, key=f"sample_{q}", use_container_width=True):
-                st.session_state.sample_question = q
-                st.rerun()
-        
-        # Auto-fill sample question
-        if 'sample_question' in st.session_state:
-            question = st.session_state.sample_question
-            del st.session_state.sample_question
+        for q in SAMPLE_QUESTIONS:
+            st.button(q, key=f"sample_{q}", use_container_width=True,
+                      on_click=use_sample_question, args=(q,))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file